@@ -0,0 +1,54 @@
+# app/routers/leaderboard.py
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from app.models.leaderboard import LeaderboardEntry, LeaderboardRankResponse
+from app.db import prisma
+from app.dependencies import get_current_user
+from app.core.leaderboard import leaderboard
+
+router = APIRouter()
+
+def to_entries(ranked):
+    return [
+        LeaderboardEntry(
+            rank=rank,
+            user_id=user_id,
+            username=leaderboard.username(user_id),
+            total_coins=total_coins
+        )
+        for rank, user_id, total_coins in ranked
+    ]
+
+@router.get("/", response_model=list[LeaderboardEntry])
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    current_user=Depends(get_current_user)
+):
+    # 直接读取内存索引，不查询数据库
+    return to_entries(leaderboard.top(limit))
+
+@router.get("/me", response_model=LeaderboardRankResponse)
+async def get_my_rank(current_user=Depends(get_current_user)):
+    rank = leaderboard.rank(current_user.user_id)
+    if rank is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found in leaderboard"
+        )
+    
+    return LeaderboardRankResponse(
+        user_id=current_user.user_id,
+        rank=rank,
+        total_coins=leaderboard.coins(current_user.user_id),
+        total_users=len(leaderboard)
+    )
+
+@router.get("/friends", response_model=list[LeaderboardEntry])
+async def get_friends_leaderboard(current_user=Depends(get_current_user)):
+    # 好友排行榜：当前用户和其好友之间的排名
+    friendships = await prisma.friendship.find_many(
+        where={"user_id": current_user.user_id}
+    )
+    user_ids = [friendship.friend_id for friendship in friendships]
+    user_ids.append(current_user.user_id)
+    
+    return to_entries(leaderboard.ranked_among(user_ids))
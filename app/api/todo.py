@@ -1,16 +1,38 @@
 # app/routers/todo.py
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Response, Header
 from app.models.todo import TodoCreate, TodoResponse, TodoUpdate, TodoComplete, TransactionType
 from app.db import prisma
 from app.dependencies import get_current_user
-from datetime import datetime
+from datetime import datetime, timezone
 from app.core.security import calculate_coins_for_todo
+from app.core.singleflight import read_flight
+from app.core.encoding import encode_payload
+from app.core.idempotency import idempotency_store
+from app.core.recurrence import as_utc, next_occurrence, expand_occurrences
+from app.core.leaderboard import leaderboard
 from typing import Optional
 
 router = APIRouter()
 
 @router.post("/", response_model=TodoResponse, status_code=status.HTTP_201_CREATED)
-async def create_todo(todo: TodoCreate, current_user=Depends(get_current_user)):
+async def create_todo(
+    todo: TodoCreate,
+    current_user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    if idempotency_key is None:
+        return await _create_todo(todo, current_user)
+    # 客户端重试时直接返回首次创建的结果
+    return await idempotency_store.run(
+        current_user.user_id,
+        idempotency_key,
+        "create_todo",
+        todo,
+        lambda: _create_todo(todo, current_user),
+        status_code=status.HTTP_201_CREATED
+    )
+
+async def _create_todo(todo: TodoCreate, current_user):
     # 验证类别是否属于当前用户（如果提供了类别ID）
     category = None
     if todo.category_id:
@@ -23,7 +45,20 @@ async def create_todo(todo: TodoCreate, current_user=Depends(get_current_user)):
                 detail="Invalid category or category does not belong to current user"
             )
     
-    # 创建新待办事项
+    # 重复待办需要截止日期来计算下一次
+    if todo.recurrence_frequency and not todo.due_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Recurring todos require a due date"
+        )
+    
+    if todo.recurrence_until and todo.due_date and as_utc(todo.recurrence_until) < as_utc(todo.due_date):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Recurrence end date cannot be earlier than the due date"
+        )
+    
+    # 创建新待办事项（重复待办只保存下一次，后续实例在完成时再创建）
     new_todo = await prisma.todo.create(
         data={
             "user_id": current_user.user_id,
@@ -31,9 +66,13 @@ async def create_todo(todo: TodoCreate, current_user=Depends(get_current_user)):
             "description": todo.description,
             "due_date": todo.due_date,
             "category_id": todo.category_id,
-            "base_coin_value": 5  # 固定基础值
+            "base_coin_value": 5,  # 固定基础值
+            "recurrence_frequency": todo.recurrence_frequency,
+            "recurrence_interval": todo.recurrence_interval,
+            "recurrence_until": todo.recurrence_until
         }
     )
+    read_flight.forget(current_user.user_id)
     
     # 添加类别信息到响应
     todo_response = TodoResponse(**new_todo.dict())
@@ -47,33 +86,67 @@ async def create_todo(todo: TodoCreate, current_user=Depends(get_current_user)):
 async def get_user_todos(
     completed: Optional[bool] = None,
     category_id: Optional[int] = None,
+    expand_from: Optional[datetime] = None,
+    expand_until: Optional[datetime] = None,
     current_user=Depends(get_current_user)
 ):
-    # 构建查询条件
-    where_conditions = {"user_id": current_user.user_id}
-    
-    if completed is not None:
-        where_conditions["completed"] = completed
-    
-    if category_id is not None:
-        where_conditions["category_id"] = category_id
-    
-    # 获取待办事项
-    todos = await prisma.todo.find_many(
-        where=where_conditions,
-        include={"category": True},
-        order={"due_date": "asc"}  # 按截止日期升序排列
+    async def load():
+        # 构建查询条件
+        where_conditions = {"user_id": current_user.user_id}
+        
+        if completed is not None:
+            where_conditions["completed"] = completed
+        
+        if category_id is not None:
+            where_conditions["category_id"] = category_id
+        
+        # 获取待办事项
+        todos = await prisma.todo.find_many(
+            where=where_conditions,
+            include={"category": True},
+            order={"due_date": "asc"}  # 按截止日期升序排列
+        )
+        
+        # 转换为响应模型
+        response_todos = []
+        for todo in todos:
+            todo_data = todo.dict()
+            todo_data["category_name"] = todo.category.category_name if todo.category else None
+            todo_data["difficulty_multiplier"] = todo.category.difficulty_multiplier if todo.category else 1.0
+            response_todos.append(TodoResponse(**todo_data))
+            
+            # 按重复规则展开窗口内的未来实例，只在响应中生成，不写入数据库
+            if expand_until and not todo.completed and todo.recurrence_frequency and todo.due_date:
+                for due_date in expand_occurrences(
+                    todo.due_date,
+                    todo.recurrence_frequency,
+                    todo.recurrence_interval,
+                    todo.recurrence_until,
+                    expand_from or datetime.now(timezone.utc),  # 默认只展开从现在开始的实例
+                    expand_until
+                ):
+                    # 虚拟实例没有自己的 todo_id，通过 series_todo_id 指向当前真实的待办
+                    response_todos.append(TodoResponse(**{
+                        **todo_data,
+                        "todo_id": None,
+                        "series_todo_id": todo.todo_id,
+                        "due_date": due_date,
+                        "is_virtual": True
+                    }))
+        
+        if expand_until:
+            # 保持按截止日期升序，没有截止日期的排在最后
+            response_todos.sort(key=lambda t: (t.due_date is None, as_utc(t.due_date) if t.due_date else None))
+        
+        return encode_payload(response_todos)
+
+    # 相同用户、相同查询的并发请求共享同一次数据库查询和序列化结果
+    payload = await read_flight.do(
+        current_user.user_id,
+        ("todos", completed, category_id, expand_from, expand_until),
+        load
     )
-    
-    # 转换为响应模型
-    response_todos = []
-    for todo in todos:
-        todo_data = todo.dict()
-        todo_data["category_name"] = todo.category.category_name if todo.category else None
-        todo_data["difficulty_multiplier"] = todo.category.difficulty_multiplier if todo.category else 1.0
-        response_todos.append(TodoResponse(**todo_data))
-    
-    return response_todos
+    return Response(content=payload, media_type="application/json")
 
 @router.get("/{todo_id}", response_model=TodoResponse)
 async def get_todo(todo_id: int, current_user=Depends(get_current_user)):
@@ -155,6 +228,37 @@ async def update_todo(
     if update.category_id is not None:
         update_data["category_id"] = update.category_id
     
+    # 更新重复规则
+    if update.clear_recurrence:
+        # 取消重复
+        update_data["recurrence_frequency"] = None
+        update_data["recurrence_interval"] = 1
+        update_data["recurrence_until"] = None
+    else:
+        if update.recurrence_frequency is not None:
+            update_data["recurrence_frequency"] = update.recurrence_frequency
+        
+        if update.recurrence_interval is not None:
+            update_data["recurrence_interval"] = update.recurrence_interval
+        
+        if update.recurrence_until is not None:
+            update_data["recurrence_until"] = update.recurrence_until
+        
+        # 校验更新后的重复规则
+        frequency = update.recurrence_frequency or existing.recurrence_frequency
+        due_date = update.due_date or existing.due_date
+        until = update.recurrence_until or existing.recurrence_until
+        if frequency and not due_date:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Recurring todos require a due date"
+            )
+        if frequency and until and due_date and as_utc(until) < as_utc(due_date):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Recurrence end date cannot be earlier than the due date"
+            )
+    
     # 如果没有更新数据
     if not update_data:
         return await get_todo(todo_id, current_user)
@@ -165,6 +269,7 @@ async def update_todo(
         data=update_data,
         include={"category": True}
     )
+    read_flight.forget(current_user.user_id)
     
     # 转换为响应模型
     todo_data = updated_todo.dict()
@@ -194,14 +299,28 @@ async def delete_todo(todo_id: int, current_user=Depends(get_current_user)):
     
     # 删除待办事项
     await prisma.todo.delete(where={"todo_id": todo_id})
+    read_flight.forget(current_user.user_id)
     return
 
 @router.put("/{todo_id}/complete", response_model=TodoResponse)
 async def complete_todo(
     todo_id: int, 
     complete: TodoComplete = TodoComplete(),
-    current_user=Depends(get_current_user)
+    current_user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
+    if idempotency_key is None:
+        return await _complete_todo(todo_id, current_user)
+    # 客户端重试时直接返回首次完成的结果，不会重复发放金币
+    return await idempotency_store.run(
+        current_user.user_id,
+        idempotency_key,
+        f"complete_todo:{todo_id}",
+        complete,
+        lambda: _complete_todo(todo_id, current_user)
+    )
+
+async def _complete_todo(todo_id: int, current_user):
     # 获取现有待办事项
     todo = await prisma.todo.find_unique(
         where={"todo_id": todo_id},
@@ -230,32 +349,64 @@ async def complete_todo(
     multiplier = todo.category.difficulty_multiplier if todo.category else 1.0
     coins_earned = calculate_coins_for_todo(todo.base_coin_value, multiplier)
     
-    # 更新待办事项状态
-    updated_todo = await prisma.todo.update(
+    # 同一用户的金币变更串行执行，索引中的金币数总是最后提交的值
+    async with leaderboard.balance_lock(current_user.user_id):
+        async with prisma.tx() as transaction:
+            # 只有未完成的待办才会被标记，并发的重复完成请求中只有一个能成功
+            marked = await transaction.todo.update_many(
+                where={"todo_id": todo_id, "completed": False},
+                data={
+                    "completed": True,
+                    "completion_date": datetime.utcnow()
+                }
+            )
+            if marked == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Todo is already completed"
+                )
+        
+            # 重复待办：完成时再创建下一次实例
+            if todo.recurrence_frequency and todo.due_date:
+                next_due_date = next_occurrence(todo.due_date, todo.recurrence_frequency, todo.recurrence_interval)
+                if not todo.recurrence_until or as_utc(next_due_date) <= as_utc(todo.recurrence_until):
+                    await transaction.todo.create(
+                        data={
+                            "user_id": todo.user_id,
+                            "title": todo.title,
+                            "description": todo.description,
+                            "due_date": next_due_date,
+                            "category_id": todo.category_id,
+                            "base_coin_value": todo.base_coin_value,
+                            "recurrence_frequency": todo.recurrence_frequency,
+                            "recurrence_interval": todo.recurrence_interval,
+                            "recurrence_until": todo.recurrence_until
+                        }
+                    )
+        
+            # 创建金币交易记录
+            await transaction.cointransaction.create(
+                data={
+                    "user_id": current_user.user_id,
+                    "amount": coins_earned,
+                    "transaction_type": TransactionType.TASK_COMPLETION,
+                    "related_todo_id": todo_id
+                }
+            )
+        
+            # 更新用户总金币
+            updated_user = await transaction.user.update(
+                where={"user_id": current_user.user_id},
+                data={"total_coins": {"increment": coins_earned}}
+            )
+        read_flight.forget(current_user.user_id)
+        leaderboard.update(updated_user.user_id, updated_user.total_coins, updated_user.username)
+    
+    updated_todo = await prisma.todo.find_unique(
         where={"todo_id": todo_id},
-        data={
-            "completed": True,
-            "completion_date": datetime.utcnow()
-        },
         include={"category": True}
     )
     
-    # 创建金币交易记录
-    await prisma.cointransaction.create(
-        data={
-            "user_id": current_user.user_id,
-            "amount": coins_earned,
-            "transaction_type": TransactionType.TASK_COMPLETION,
-            "related_todo_id": todo_id
-        }
-    )
-    
-    # 更新用户总金币
-    await prisma.user.update(
-        where={"user_id": current_user.user_id},
-        data={"total_coins": {"increment": coins_earned}}
-    )
-    
     # 转换为响应模型
     todo_data = updated_todo.dict()
     todo_data["category_name"] = updated_todo.category.category_name if updated_todo.category else None
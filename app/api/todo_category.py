@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from app.models.todo_category import TodoCategoryCreate, TodoCategoryResponse, TodoCategoryUpdate
 from app.db import prisma
 from app.dependencies import get_current_user
+from app.core.singleflight import read_flight
 from datetime import datetime
 
 router = APIRouter()
@@ -31,6 +32,7 @@ async def create_category(category: TodoCategoryCreate, current_user=Depends(get
             "created_at": datetime.now()
         }
     )
+    read_flight.forget(current_user.user_id)
     return new_category
 
 @router.get("/", response_model=list[TodoCategoryResponse])
@@ -121,6 +123,7 @@ async def update_category(
         where={"category_id": category_id},
         data=update_data
     )
+    read_flight.forget(current_user.user_id)
     return updated_category
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -152,4 +155,5 @@ async def delete_category(category_id: int, current_user=Depends(get_current_use
     
     # 删除类别
     await prisma.todocategory.delete(where={"category_id": category_id})
+    read_flight.forget(current_user.user_id)
     return
\ No newline at end of file
@@ -1,11 +1,15 @@
 # app/routers/user.py
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.models.user import UserRegisterRequest, UserRegisterResponse, UserLoginRequest, UserLoginResponse, UserProfileResponse, UserUpdate
+from fastapi import APIRouter, HTTPException, Depends, status, Response
+from app.models.user import UserRegisterRequest, UserRegisterResponse, UserLoginRequest, UserLoginResponse, UserProfileResponse, UserUpdate, FriendResponse
 from app.db import prisma
 from app.core.security import hash_password, verify_password, create_access_token, verify_token
 from app.dependencies import get_current_user
+from app.core.singleflight import read_flight
+from app.core.encoding import encode_payload
+from app.core.leaderboard import leaderboard
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
+from prisma.errors import UniqueViolationError
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
@@ -31,6 +35,7 @@ async def register(user: UserRegisterRequest):
             "total_coins": 0,
         }
     )
+    leaderboard.update(new_user.user_id, new_user.total_coins, new_user.username)
     return new_user
 
 @router.post("/login", response_model=UserLoginResponse)
@@ -74,7 +79,12 @@ async def logout(token: str = Depends(oauth2_scheme), current_user=Depends(get_c
 
 @router.get("/me", response_model=UserProfileResponse)
 async def get_me(current_user=Depends(get_current_user)):
-    return current_user
+    async def load():
+        return encode_payload(current_user)
+
+    # 同一用户的并发请求共享同一份序列化结果
+    payload = await read_flight.do(current_user.user_id, ("me",), load)
+    return Response(content=payload, media_type="application/json")
 
 @router.put("/me", response_model=UserProfileResponse)
 async def update_me(update: UserUpdate, current_user=Depends(get_current_user)):
@@ -108,4 +118,52 @@ async def update_me(update: UserUpdate, current_user=Depends(get_current_user)):
         where={"user_id": current_user.user_id},
         data=update_data
     )
-    return updated_user
\ No newline at end of file
+    read_flight.forget(current_user.user_id)
+    # 只更新用户名，金币数只在持有 balance_lock 时更新
+    leaderboard.rename(updated_user.user_id, updated_user.username)
+    return updated_user
+
+@router.get("/me/friends", response_model=list[FriendResponse])
+async def get_my_friends(current_user=Depends(get_current_user)):
+    friendships = await prisma.friendship.find_many(
+        where={"user_id": current_user.user_id},
+        include={"friend": True}
+    )
+    return [
+        FriendResponse(user_id=friendship.friend.user_id, username=friendship.friend.username)
+        for friendship in friendships
+    ]
+
+@router.post("/me/friends/{friend_id}", response_model=FriendResponse, status_code=status.HTTP_201_CREATED)
+async def add_friend(friend_id: int, current_user=Depends(get_current_user)):
+    if friend_id == current_user.user_id:
+        raise HTTPException(status_code=400, detail="Cannot add yourself as a friend")
+    
+    friend = await prisma.user.find_unique(where={"user_id": friend_id})
+    if not friend:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    
+    # 检查是否已经是好友
+    existing = await prisma.friendship.find_first(
+        where={"user_id": current_user.user_id, "friend_id": friend_id}
+    )
+    if existing:
+        raise HTTPException(status_code=400, detail="Already friends")
+    
+    try:
+        await prisma.friendship.create(
+            data={"user_id": current_user.user_id, "friend_id": friend_id}
+        )
+    except UniqueViolationError:
+        # 并发的重复添加请求
+        raise HTTPException(status_code=400, detail="Already friends")
+    return FriendResponse(user_id=friend.user_id, username=friend.username)
+
+@router.delete("/me/friends/{friend_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_friend(friend_id: int, current_user=Depends(get_current_user)):
+    deleted = await prisma.friendship.delete_many(
+        where={"user_id": current_user.user_id, "friend_id": friend_id}
+    )
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Friend not found")
+    return
\ No newline at end of file
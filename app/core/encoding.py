@@ -0,0 +1,11 @@
+# app/core/encoding.py
+from typing import Any
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def encode_payload(content: Any) -> bytes:
+    """
+    序列化为 JSON 字节，结果可以在多个请求之间直接共享或保存
+    """
+    return JSONResponse(content=jsonable_encoder(content)).body
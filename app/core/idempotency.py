@@ -0,0 +1,247 @@
+# app/core/idempotency.py
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from prisma.errors import UniqueViolationError
+from app.core.encoding import encode_payload
+from app.core.singleflight import SingleFlight
+from app.db import prisma
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_SECONDS = 60 * 60 * 24  # 24小时
+IDEMPOTENCY_MAX_ENTRIES = 10000
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# 设置 IDEMPOTENCY_DB=1 时同时使用数据库：执行前先插入占位记录占用 key（有效期与响应相同），
+# 多个实例之间的重复请求只会执行一次，重启后也能返回已保存的响应。
+# 处理函数执行中进程崩溃，或执行成功后保存响应失败时，占位记录会保留到过期，
+# 期间使用同一个 key 的请求返回 409，而不会再次执行
+IDEMPOTENCY_USE_DB = os.getenv("IDEMPOTENCY_DB", "").lower() in ("1", "true", "yes")
+IDEMPOTENCY_PURGE_EVERY = 100  # 每保存多少条记录清理一次数据库中的过期记录
+
+# (过期时间, 请求指纹, 状态码, 响应体)
+StoredResponse = Tuple[float, str, int, bytes]
+
+
+class IdempotencyStore:
+    """
+    按 Idempotency-Key 保存响应：重试请求直接返回已保存的响应，不再执行处理函数；
+    并发的重复请求等待第一次执行的结果。
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, use_db: bool = False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_db = use_db
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._saves = 0
+
+    async def run(
+        self,
+        user_id: int,
+        idempotency_key: str,
+        scope: str,
+        request_data: Any,
+        fn: Callable[[], Awaitable[Any]],
+        status_code: int = status.HTTP_200_OK
+    ) -> Response:
+        if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid Idempotency-Key header"
+            )
+
+        # key 不包含 scope：同一个 key 用在其他接口或其他待办上时由指纹校验返回 422
+        store_key = f"{user_id}:{idempotency_key}"
+        fingerprint = self._fingerprint(scope, request_data)
+
+        stored = self._lookup_memory(store_key)
+        replayed = True
+        if stored is None:
+            # 并发的重复请求共享同一次查找/执行；owner 用来区分真正执行处理函数的那个请求
+            owner = object()
+            executed_by, stored = await self._flight.do(
+                user_id,
+                store_key,
+                lambda: self._resolve(user_id, store_key, fingerprint, fn, status_code, owner)
+            )
+            replayed = executed_by is not owner
+
+        _, stored_fingerprint, stored_status, body = stored
+        self._check_fingerprint(fingerprint, stored_fingerprint)
+        return self._response(stored_status, body, replayed=replayed)
+
+    async def _resolve(
+        self,
+        user_id: int,
+        store_key: str,
+        fingerprint: str,
+        fn: Callable[[], Awaitable[Any]],
+        status_code: int,
+        owner: object
+    ) -> Tuple[Optional[object], StoredResponse]:
+        # 1. 已有保存的响应，直接返回
+        stored = self._lookup_memory(store_key)
+        if stored is not None:
+            return None, stored
+        if self.use_db:
+            stored = await self._claim_db(user_id, store_key, fingerprint)
+            if stored is not None:
+                return None, stored
+
+        # 2. 首次执行；处理函数抛出的异常不保存，客户端重试时会重新执行
+        try:
+            result = await fn()
+        except BaseException:
+            if self.use_db:
+                await self._release_db(store_key)
+            raise
+
+        stored = (time.time() + self.ttl_seconds, fingerprint, status_code, encode_payload(result))
+        self._remember(store_key, stored)
+        if self.use_db:
+            await self._save_to_db(user_id, store_key, stored)
+        return owner, stored
+
+    def _lookup_memory(self, store_key: str) -> Optional[StoredResponse]:
+        stored = self._entries.get(store_key)
+        if stored is None:
+            return None
+        if stored[0] <= time.time():
+            del self._entries[store_key]
+            return None
+        self._entries.move_to_end(store_key)
+        return stored
+
+    async def _claim_db(self, user_id: int, store_key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """
+        在数据库中占用 key：返回已完成的响应，或返回 None 表示由当前请求执行。
+        数据库不可用时记录日志并退回到仅使用内存。
+        """
+        try:
+            record = await prisma.idempotencyrecord.find_unique(where={"key": store_key})
+            if record and record.expires_at.timestamp() <= time.time():
+                await prisma.idempotencyrecord.delete_many(
+                    where={"key": store_key, "expires_at": {"lte": datetime.utcnow()}}
+                )
+                record = None
+
+            if record is None:
+                try:
+                    await prisma.idempotencyrecord.create(
+                        data={
+                            "key": store_key,
+                            "user_id": user_id,
+                            "fingerprint": fingerprint,
+                            "expires_at": datetime.utcfromtimestamp(time.time() + self.ttl_seconds)
+                        }
+                    )
+                    return None
+                except UniqueViolationError:
+                    # 其他实例刚刚占用了这个 key
+                    record = await prisma.idempotencyrecord.find_unique(where={"key": store_key})
+        except Exception:
+            logger.exception("Idempotency DB lookup failed for %s, falling back to memory", store_key)
+            return None
+
+        if record is None or record.status_code is None:
+            if record is not None:
+                self._check_fingerprint(fingerprint, record.fingerprint)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is already in progress"
+            )
+
+        stored = (
+            record.expires_at.timestamp(),
+            record.fingerprint,
+            record.status_code,
+            record.response_body.encode("utf-8")
+        )
+        self._remember(store_key, stored)
+        return stored
+
+    async def _release_db(self, store_key: str) -> None:
+        # 执行失败时删除占位记录，允许客户端重试
+        try:
+            await prisma.idempotencyrecord.delete_many(
+                where={"key": store_key, "status_code": None}
+            )
+        except Exception:
+            logger.exception("Failed to release idempotency record %s", store_key)
+
+    def _remember(self, store_key: str, stored: StoredResponse) -> None:
+        self._entries[store_key] = stored
+        self._entries.move_to_end(store_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _save_to_db(self, user_id: int, store_key: str, stored: StoredResponse) -> None:
+        # 处理函数已执行成功，写库失败不应让本次请求失败；内存中仍保留该记录
+        expires_at, fingerprint, status_code, body = stored
+        data = {
+            "user_id": user_id,
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "response_body": body.decode("utf-8"),
+            "expires_at": datetime.utcfromtimestamp(expires_at)
+        }
+        try:
+            await prisma.idempotencyrecord.upsert(
+                where={"key": store_key},
+                data={
+                    "create": {"key": store_key, **data},
+                    "update": data
+                }
+            )
+
+            # 定期清理过期记录，避免表无限增长
+            self._saves += 1
+            if self._saves % IDEMPOTENCY_PURGE_EVERY == 0:
+                await prisma.idempotencyrecord.delete_many(
+                    where={"expires_at": {"lt": datetime.utcnow()}}
+                )
+        except Exception:
+            logger.exception("Failed to persist idempotency record %s", store_key)
+
+    @staticmethod
+    def _fingerprint(scope: str, request_data: Any) -> str:
+        encoded = json.dumps(
+            [scope, jsonable_encoder(request_data)],
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _check_fingerprint(fingerprint: str, expected: str) -> None:
+        if fingerprint != expected:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key has already been used with a different request"
+            )
+
+    @staticmethod
+    def _response(status_code: int, body: bytes, replayed: bool) -> Response:
+        headers = {"Idempotent-Replayed": "true"} if replayed else None
+        return Response(
+            content=body,
+            status_code=status_code,
+            media_type="application/json",
+            headers=headers
+        )
+
+
+idempotency_store = IdempotencyStore(
+    max_entries=IDEMPOTENCY_MAX_ENTRIES,
+    ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+    use_db=IDEMPOTENCY_USE_DB
+)
@@ -0,0 +1,102 @@
+# app/core/leaderboard.py
+import asyncio
+import weakref
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class CoinLeaderboard:
+    """
+    进程内的金币排行榜索引：按 (-total_coins, user_id) 升序保存的有序数组。
+    启动时从数据库重建，金币变化时增量更新；排名查询为 O(log n)，不访问数据库。
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int]] = []  # (-total_coins, user_id)
+        self._coins: Dict[int, int] = {}
+        self._usernames: Dict[int, str] = {}
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, rows: Iterable[Tuple[int, str, int]]) -> None:
+        """
+        用 (user_id, username, total_coins) 列表重建索引
+        """
+        self._coins = {}
+        self._usernames = {}
+        for user_id, username, total_coins in rows:
+            self._coins[user_id] = total_coins
+            self._usernames[user_id] = username
+        self._keys = sorted((-coins, user_id) for user_id, coins in self._coins.items())
+
+    def update(self, user_id: int, total_coins: int, username: Optional[str] = None) -> None:
+        """
+        新增用户或更新用户的金币总数
+        """
+        if username is not None:
+            self._usernames[user_id] = username
+        old_coins = self._coins.get(user_id)
+        if old_coins == total_coins:
+            return
+        if old_coins is not None:
+            del self._keys[bisect_left(self._keys, (-old_coins, user_id))]
+        self._coins[user_id] = total_coins
+        insort(self._keys, (-total_coins, user_id))
+
+    def rename(self, user_id: int, username: str) -> None:
+        if user_id in self._coins:
+            self._usernames[user_id] = username
+
+    def balance_lock(self, user_id: int) -> asyncio.Lock:
+        """
+        修改金币时持有该锁，保证数据库更新和索引更新按同一顺序进行，
+        避免较旧的金币数覆盖较新的值
+        """
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    def coins(self, user_id: int) -> Optional[int]:
+        return self._coins.get(user_id)
+
+    def username(self, user_id: int) -> Optional[str]:
+        return self._usernames.get(user_id)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """
+        返回用户排名（金币相同则名次相同），用户不存在时返回 None
+        """
+        coins = self._coins.get(user_id)
+        if coins is None:
+            return None
+        # (-coins,) 小于所有 (-coins, user_id)，定位到第一个同分用户
+        return bisect_left(self._keys, (-coins,)) + 1
+
+    def top(self, limit: int) -> List[Tuple[int, int, int]]:
+        """
+        返回前 limit 名的 (rank, user_id, total_coins)
+        """
+        return self._ranked(self._keys[:limit])
+
+    def ranked_among(self, user_ids: Iterable[int]) -> List[Tuple[int, int, int]]:
+        """
+        返回指定用户集合内部的排名 (rank, user_id, total_coins)，用于好友排行榜
+        """
+        keys = sorted((-self._coins[user_id], user_id) for user_id in set(user_ids) if user_id in self._coins)
+        return self._ranked(keys)
+
+    @staticmethod
+    def _ranked(keys: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+        entries = []
+        for index, (neg_coins, user_id) in enumerate(keys):
+            # 金币相同则名次相同
+            rank = entries[-1][0] if entries and entries[-1][2] == -neg_coins else index + 1
+            entries.append((rank, user_id, -neg_coins))
+        return entries
+
+
+leaderboard = CoinLeaderboard()
@@ -0,0 +1,65 @@
+# app/core/recurrence.py
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+MAX_VIRTUAL_OCCURRENCES = 366  # 每个重复待办最多展开的实例数量
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    统一为带时区的 UTC 时间，避免比较 naive 与 aware datetime 时出错
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def next_occurrence(due_date: datetime, frequency: str, interval: int) -> datetime:
+    """
+    计算下一次重复的截止日期
+    :param due_date: 当前截止日期
+    :param frequency: 重复频率（DAILY / WEEKLY）
+    :param interval: 每隔多少个周期重复一次
+    :return: 下一次的截止日期
+    """
+    return due_date + recurrence_step(frequency, interval)
+
+
+def recurrence_step(frequency: str, interval: int) -> timedelta:
+    days = interval * 7 if frequency == "WEEKLY" else interval
+    return timedelta(days=days)
+
+
+def expand_occurrences(
+    due_date: datetime,
+    frequency: str,
+    interval: int,
+    until: Optional[datetime],
+    window_start: datetime,
+    window_end: datetime,
+    limit: int = MAX_VIRTUAL_OCCURRENCES
+) -> List[datetime]:
+    """
+    展开当前截止日期之后、位于 [window_start, window_end] 窗口内的重复日期（不包含当前这一次）
+    :param until: 重复结束日期（包含），为空表示不结束
+    :param window_start: 窗口开始时间，之前的日期不展开
+    :param window_end: 窗口结束时间
+    :param limit: 最多展开的数量（只计算窗口内的日期）
+    :return: 截止日期列表
+    """
+    end = as_utc(window_end)
+    if until is not None:
+        end = min(end, as_utc(until))
+
+    step = recurrence_step(frequency, interval)
+    current = as_utc(due_date) + step
+    start = as_utc(window_start)
+    if current < start:
+        # 直接跳到窗口开始之后的第一次，不逐个遍历已过去的日期
+        current += -((current - start) // step) * step
+
+    occurrences = []
+    while len(occurrences) < limit and current <= end:
+        occurrences.append(current)
+        current += step
+    return occurrences
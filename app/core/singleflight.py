@@ -0,0 +1,38 @@
+# app/core/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    合并同一用户的相同并发请求：相同 key 的请求共享同一次执行结果。
+    用于读请求时，用户发生任何写操作后调用 forget(user_id)，之后的请求不再复用写之前发起的执行。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+
+    async def do(self, user_id: int, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call_key = (user_id, key)
+        task = self._calls.get(call_key)
+        if task is None:
+            # 用独立任务执行，避免首个请求被取消时影响其他等待者
+            task = asyncio.ensure_future(fn())
+            self._calls[call_key] = task
+            task.add_done_callback(lambda t: self._done(call_key, t))
+        return await asyncio.shield(task)
+
+    def forget(self, user_id: int) -> None:
+        for call_key in [k for k in self._calls if k[0] == user_id]:
+            del self._calls[call_key]
+
+    def _done(self, call_key: Tuple[int, Hashable], task: asyncio.Task) -> None:
+        if self._calls.get(call_key) is task:
+            del self._calls[call_key]
+        # 所有等待者都被取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+
+read_flight = SingleFlight()
+
@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.db import prisma
 from app.core.security import verify_token
+from app.core.singleflight import read_flight
 from app.models.user import UserProfileResponse
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
@@ -28,7 +29,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     
     # 3. 获取用户信息
     user_id = int(payload.get("sub"))
-    user = await prisma.user.find_unique(where={"user_id": user_id})
+    # 同一用户的并发请求共享同一次用户查询（令牌校验仍逐个请求进行）
+    user = await read_flight.do(
+        user_id,
+        ("user",),
+        lambda: prisma.user.find_unique(where={"user_id": user_id})
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -2,13 +2,18 @@ from fastapi import FastAPI
 from app.api import user
 from app.api import todo_category
 from app.api import todo
+from app.api import leaderboard as leaderboard_api
 from app.db import prisma
+from app.core.leaderboard import leaderboard
 
 app = FastAPI()
 
 @app.on_event("startup")
 async def startup():
     await prisma.connect()
+    # 从数据库重建金币排行榜索引
+    rows = await prisma.query_raw('SELECT user_id, username, total_coins FROM "User"')
+    leaderboard.load((row["user_id"], row["username"], row["total_coins"]) for row in rows)
 
 @app.on_event("shutdown")
 async def shutdown():
@@ -16,4 +21,5 @@ async def shutdown():
 
 app.include_router(user.router, prefix="/api/users", tags=["Users"])
 app.include_router(todo_category.router, prefix="/api/todo-categories", tags=["Todo Categories"])
-app.include_router(todo.router, prefix="/api/todos", tags=["Todos"])
\ No newline at end of file
+app.include_router(todo.router, prefix="/api/todos", tags=["Todos"])
+app.include_router(leaderboard_api.router, prefix="/api/leaderboard", tags=["Leaderboard"])
\ No newline at end of file
@@ -0,0 +1,15 @@
+# app/models/leaderboard.py
+from pydantic import BaseModel
+from typing import Optional
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: Optional[str] = None
+    total_coins: int
+
+class LeaderboardRankResponse(BaseModel):
+    user_id: int
+    rank: int
+    total_coins: int
+    total_users: int
@@ -10,14 +10,21 @@ class TransactionType(str, Enum):
     REDEEM_REWARD = "REDEEM_REWARD"
     PENALTY = "PENALTY"
 
+class RecurrenceFrequency(str, Enum):
+    DAILY = "DAILY"
+    WEEKLY = "WEEKLY"
+
 class TodoCreate(BaseModel):
     title: str
     description: Optional[str] = None
     due_date: Optional[datetime] = None
     category_id: Optional[int] = None
+    recurrence_frequency: Optional[RecurrenceFrequency] = None  # 重复频率，需要同时设置截止日期
+    recurrence_interval: int = Field(default=1, ge=1)  # 每隔多少天/周重复一次
+    recurrence_until: Optional[datetime] = None  # 重复结束日期
 
 class TodoResponse(BaseModel):
-    todo_id: int
+    todo_id: Optional[int] = None  # 虚拟实例为空
     user_id: int
     title: str
     description: Optional[str] = None
@@ -28,12 +35,21 @@ class TodoResponse(BaseModel):
     category_id: Optional[int] = None
     category_name: Optional[str] = None  # 用于显示类别名称
     difficulty_multiplier: Optional[float] = None  # 用于显示难度系数
+    recurrence_frequency: Optional[RecurrenceFrequency] = None
+    recurrence_interval: int = Field(default=1)
+    recurrence_until: Optional[datetime] = None
+    is_virtual: bool = Field(default=False)  # 按重复规则展开的未来实例，数据库中不存在
+    series_todo_id: Optional[int] = None  # 虚拟实例所属的真实待办
 
 class TodoUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     due_date: Optional[datetime] = None
     category_id: Optional[int] = None
+    recurrence_frequency: Optional[RecurrenceFrequency] = None
+    recurrence_interval: Optional[int] = Field(default=None, ge=1)
+    recurrence_until: Optional[datetime] = None
+    clear_recurrence: bool = False  # 为 True 时取消重复规则
 
 class TodoComplete(BaseModel):
     completed: bool = True
\ No newline at end of file
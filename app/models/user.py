@@ -32,4 +32,8 @@ class UserProfileResponse(BaseModel):
 
 class UserUpdate(BaseModel):
     username: Optional[str] = None
-    password: Optional[str] = None
\ No newline at end of file
+    password: Optional[str] = None
+
+class FriendResponse(BaseModel):
+    user_id: int
+    username: str
\ No newline at end of file
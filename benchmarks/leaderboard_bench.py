@@ -0,0 +1,43 @@
+# benchmarks/leaderboard_bench.py
+# 用法: python -m benchmarks.leaderboard_bench [用户数量]
+import random
+import sys
+import time
+from app.core.leaderboard import CoinLeaderboard
+
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed / repeat * 1e6:10.2f} us/op  ({repeat} ops)")
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(42)
+    rows = [(user_id, f"user{user_id}", rng.randint(0, 100_000)) for user_id in range(1, user_count + 1)]
+
+    board = CoinLeaderboard()
+    start = time.perf_counter()
+    board.load(rows)
+    print(f"{'load':<24} {time.perf_counter() - start:10.2f} s        ({user_count} users)")
+
+    user_ids = [rng.randint(1, user_count) for _ in range(10_000)]
+    friend_ids = user_ids[:200]
+
+    timed("rank", lambda: board.rank(rng.choice(user_ids)), 100_000)
+    timed("top(10)", lambda: board.top(10), 100_000)
+    timed("top(100)", lambda: board.top(100), 10_000)
+    timed("ranked_among(200)", lambda: board.ranked_among(friend_ids), 1_000)
+
+    def complete_todo():
+        user_id = rng.choice(user_ids)
+        board.update(user_id, board.coins(user_id) + rng.randint(1, 50))
+
+    timed("update", complete_todo, 10_000)
+
+
+if __name__ == "__main__":
+    main()
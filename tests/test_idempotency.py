@@ -0,0 +1,135 @@
+# tests/test_idempotency.py
+import asyncio
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("prisma")
+
+from fastapi import HTTPException
+from app.core import idempotency
+from app.core.idempotency import IdempotencyStore
+
+
+@pytest.fixture(autouse=True)
+def no_db(monkeypatch):
+    # 内存模式不应访问数据库
+    monkeypatch.setattr(idempotency, "prisma", None)
+
+
+def counting_handler(calls, delay=0.01):
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return {"n": len(calls)}
+    return handler
+
+
+def test_concurrent_duplicates_run_once_and_waiters_are_replayed():
+    store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+    calls = []
+    handler = counting_handler(calls)
+
+    async def main():
+        return await asyncio.gather(*[
+            store.run(1, "key", "create_todo", {"title": "a"}, handler, status_code=201)
+            for _ in range(3)
+        ])
+
+    responses = asyncio.run(main())
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [201, 201, 201]
+    assert len({response.body for response in responses}) == 1
+    replayed = [response.headers.get("Idempotent-Replayed") for response in responses]
+    assert replayed.count("true") == 2
+    assert replayed.count(None) == 1
+
+
+def test_retry_is_answered_from_store():
+    store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+    calls = []
+    handler = counting_handler(calls)
+
+    first = asyncio.run(store.run(1, "key", "create_todo", {"title": "a"}, handler))
+    retry = asyncio.run(store.run(1, "key", "create_todo", {"title": "a"}, handler))
+    assert len(calls) == 1
+    assert retry.body == first.body
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+
+
+def test_key_reused_with_different_request_is_rejected():
+    store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+    calls = []
+    handler = counting_handler(calls)
+
+    asyncio.run(store.run(1, "key", "complete_todo:1", {"completed": True}, handler))
+    for scope, data in [("complete_todo:2", {"completed": True}), ("create_todo", {"title": "a"})]:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(store.run(1, "key", scope, data, handler))
+        assert error.value.status_code == 422
+    assert len(calls) == 1
+
+
+def test_keys_are_scoped_per_user():
+    store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+    calls = []
+    handler = counting_handler(calls)
+
+    asyncio.run(store.run(1, "key", "create_todo", {"title": "a"}, handler))
+    asyncio.run(store.run(2, "key", "create_todo", {"title": "a"}, handler))
+    assert len(calls) == 2
+
+
+def test_failed_handler_is_not_stored():
+    store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise HTTPException(status_code=400, detail="Todo is already completed")
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            asyncio.run(store.run(1, "key", "complete_todo:1", {}, failing))
+    assert len(calls) == 2
+
+
+def test_invalid_key_is_rejected():
+    store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(store.run(1, "x" * 256, "create_todo", {}, counting_handler([])))
+    assert error.value.status_code == 400
+
+
+def test_least_recently_used_entries_are_evicted():
+    store = IdempotencyStore(max_entries=2, ttl_seconds=60)
+    calls = []
+    handler = counting_handler(calls, delay=0)
+
+    for key in ["a", "b"]:
+        asyncio.run(store.run(1, key, "create_todo", {}, handler))
+    # 访问 a 之后，b 成为最久未使用的记录
+    asyncio.run(store.run(1, "a", "create_todo", {}, handler))
+    asyncio.run(store.run(1, "c", "create_todo", {}, handler))
+    assert len(calls) == 3
+
+    asyncio.run(store.run(1, "a", "create_todo", {}, handler))
+    assert len(calls) == 3
+    asyncio.run(store.run(1, "b", "create_todo", {}, handler))
+    assert len(calls) == 4
+
+
+def test_expired_entries_are_executed_again(monkeypatch):
+    store = IdempotencyStore(max_entries=10, ttl_seconds=60)
+    calls = []
+    handler = counting_handler(calls, delay=0)
+    now = [1000.0]
+    monkeypatch.setattr(idempotency.time, "time", lambda: now[0])
+
+    asyncio.run(store.run(1, "key", "create_todo", {}, handler))
+    now[0] += 59
+    asyncio.run(store.run(1, "key", "create_todo", {}, handler))
+    assert len(calls) == 1
+
+    now[0] += 2
+    asyncio.run(store.run(1, "key", "create_todo", {}, handler))
+    assert len(calls) == 2
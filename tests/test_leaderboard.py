@@ -0,0 +1,75 @@
+# tests/test_leaderboard.py
+import random
+from app.core.leaderboard import CoinLeaderboard
+
+
+def make_board(rows):
+    board = CoinLeaderboard()
+    board.load(rows)
+    return board
+
+
+def brute_force_rank(coins, user_id):
+    return 1 + sum(1 for value in coins.values() if value > coins[user_id])
+
+
+def test_rank_shares_position_on_ties():
+    board = make_board([(1, "a", 50), (2, "b", 80), (3, "c", 50), (4, "d", 10)])
+    assert board.rank(2) == 1
+    assert board.rank(1) == 2
+    assert board.rank(3) == 2
+    assert board.rank(4) == 4
+    assert board.rank(99) is None
+
+
+def test_top_uses_tie_ranks():
+    board = make_board([(1, "a", 50), (2, "b", 80), (3, "c", 50), (4, "d", 10)])
+    assert board.top(3) == [(1, 2, 80), (2, 1, 50), (2, 3, 50)]
+    assert board.top(10)[-1] == (4, 4, 10)
+
+
+def test_update_moves_existing_user():
+    board = make_board([(1, "a", 50), (2, "b", 80), (3, "c", 50)])
+    board.update(3, 100)
+    assert board.rank(3) == 1
+    assert board.rank(2) == 2
+    assert board.rank(1) == 3
+    assert len(board) == 3
+
+    board.update(4, 0, "d")
+    assert board.rank(4) == 4
+    assert board.username(4) == "d"
+
+
+def test_rename_only_applies_to_indexed_users():
+    board = make_board([(1, "a", 50)])
+    board.rename(1, "renamed")
+    board.rename(2, "unknown")
+    assert board.username(1) == "renamed"
+    assert board.username(2) is None
+    assert board.coins(1) == 50
+
+
+def test_ranked_among_skips_unknown_ids():
+    board = make_board([(1, "a", 50), (2, "b", 80), (3, "c", 50), (4, "d", 10)])
+    assert board.ranked_among([1, 3, 4, 99, 1]) == [(1, 1, 50), (1, 3, 50), (3, 4, 10)]
+
+
+def test_matches_brute_force_after_random_updates():
+    rng = random.Random(7)
+    board = make_board([(user_id, str(user_id), rng.randint(0, 20)) for user_id in range(1, 200)])
+    for _ in range(2000):
+        board.update(rng.randint(1, 250), rng.randint(0, 20))
+
+    coins = {user_id: board.coins(user_id) for user_id in range(1, 251) if board.coins(user_id) is not None}
+    assert len(board) == len(coins)
+    for user_id in coins:
+        assert board.rank(user_id) == brute_force_rank(coins, user_id)
+    assert [entry[0] for entry in board.top(50)] == [board.rank(entry[1]) for entry in board.top(50)]
+
+
+def test_balance_lock_is_shared_per_user():
+    board = CoinLeaderboard()
+    lock = board.balance_lock(1)
+    assert board.balance_lock(1) is lock
+    assert board.balance_lock(2) is not lock
@@ -0,0 +1,71 @@
+# tests/test_recurrence.py
+from datetime import datetime, timedelta, timezone
+from app.core.recurrence import as_utc, next_occurrence, expand_occurrences
+
+UTC = timezone.utc
+
+
+def test_as_utc_handles_naive_and_aware_values():
+    naive = datetime(2026, 1, 1, 8)
+    assert as_utc(naive) == datetime(2026, 1, 1, 8, tzinfo=UTC)
+    shanghai = timezone(timedelta(hours=8))
+    aware = as_utc(datetime(2026, 1, 1, 8, tzinfo=shanghai))
+    assert aware == datetime(2026, 1, 1, 0, tzinfo=UTC)
+    assert aware.tzinfo == UTC
+
+
+def test_next_occurrence_daily_and_weekly_intervals():
+    due = datetime(2026, 1, 1, tzinfo=UTC)
+    assert next_occurrence(due, "DAILY", 1) == datetime(2026, 1, 2, tzinfo=UTC)
+    assert next_occurrence(due, "DAILY", 3) == datetime(2026, 1, 4, tzinfo=UTC)
+    assert next_occurrence(due, "WEEKLY", 2) == datetime(2026, 1, 15, tzinfo=UTC)
+
+
+def test_expand_excludes_current_occurrence_and_stops_at_window_end():
+    due = datetime(2026, 1, 1, tzinfo=UTC)
+    occurrences = expand_occurrences(due, "WEEKLY", 2, None, due, datetime(2026, 2, 26))
+    assert occurrences == [
+        datetime(2026, 1, 15, tzinfo=UTC),
+        datetime(2026, 1, 29, tzinfo=UTC),
+        datetime(2026, 2, 12, tzinfo=UTC),
+        datetime(2026, 2, 26, tzinfo=UTC)
+    ]
+
+
+def test_expand_until_bound_is_inclusive():
+    due = datetime(2026, 1, 1, tzinfo=UTC)
+    occurrences = expand_occurrences(due, "DAILY", 1, datetime(2026, 1, 4), due, datetime(2026, 3, 1))
+    assert occurrences[-1] == datetime(2026, 1, 4, tzinfo=UTC)
+    assert len(occurrences) == 3
+
+
+def test_expand_skips_past_occurrences_before_window_start():
+    # 逾期 400 天的每日待办：只返回窗口内的日期
+    due = datetime(2025, 1, 1, tzinfo=UTC)
+    window_start = due + timedelta(days=400, hours=12)
+    occurrences = expand_occurrences(due, "DAILY", 1, None, window_start, window_start + timedelta(days=3))
+    assert occurrences == [due + timedelta(days=401 + offset) for offset in range(3)]
+
+
+def test_expand_window_start_on_an_occurrence_is_included():
+    due = datetime(2026, 1, 1, tzinfo=UTC)
+    window_start = datetime(2026, 1, 15, tzinfo=UTC)
+    occurrences = expand_occurrences(due, "WEEKLY", 1, None, window_start, datetime(2026, 1, 22, tzinfo=UTC))
+    assert occurrences == [window_start, datetime(2026, 1, 22, tzinfo=UTC)]
+
+
+def test_expand_cap_only_counts_occurrences_in_window():
+    due = datetime(2020, 1, 1, tzinfo=UTC)
+    window_start = datetime(2026, 1, 1, tzinfo=UTC)
+    occurrences = expand_occurrences(due, "DAILY", 1, None, window_start, datetime(2030, 1, 1), limit=5)
+    assert occurrences == [window_start + timedelta(days=offset) for offset in range(5)]
+
+
+def test_expand_accepts_mixed_naive_and_aware_inputs():
+    due = datetime(2026, 1, 1)
+    occurrences = expand_occurrences(
+        due, "DAILY", 1, None,
+        datetime(2026, 1, 1, tzinfo=UTC),
+        datetime(2026, 1, 3, tzinfo=UTC)
+    )
+    assert occurrences == [datetime(2026, 1, 2, tzinfo=UTC), datetime(2026, 1, 3, tzinfo=UTC)]
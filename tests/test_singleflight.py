@@ -0,0 +1,98 @@
+# tests/test_singleflight.py
+import asyncio
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        return await asyncio.gather(*[flight.do(1, "todos", load) for _ in range(5)])
+
+    assert asyncio.run(main()) == [1, 1, 1, 1, 1]
+    assert len(calls) == 1
+
+
+def test_different_users_and_keys_do_not_share():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        await asyncio.gather(
+            flight.do(1, "todos", load),
+            flight.do(2, "todos", load),
+            flight.do(1, "me", load)
+        )
+
+    asyncio.run(main())
+    assert len(calls) == 3
+
+
+def test_forget_ends_sharing_for_later_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        before = asyncio.ensure_future(flight.do(1, "todos", load))
+        await asyncio.sleep(0)
+        flight.forget(1)
+        after = asyncio.ensure_future(flight.do(1, "todos", load))
+        await asyncio.gather(before, after)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_finished_calls_are_not_reused():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        first = await flight.do(1, "todos", load)
+        second = await flight.do(1, "todos", load)
+        return first, second
+
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_exception_is_shared_and_not_cached():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*[flight.do(1, "todos", load) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 1
+
+    try:
+        asyncio.run(flight.do(1, "todos", load))
+    except ValueError:
+        pass
+    assert len(calls) == 2